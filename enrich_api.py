@@ -4,12 +4,58 @@ import requests
 import logging
 import os
 import sys
-from datetime import datetime
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from collections import namedtuple
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rapidfuzz import fuzz
 try:
     import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.utils import get_column_letter
+    
+    # Styles créés une seule fois : vert clair pour les correspondances, rouge clair pour les non-correspondances
+    FILL_OUI = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    FILL_NON = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    FILL_NON_ROW = PatternFill(start_color="FFEBEE", end_color="FFEBEE", fill_type="solid")
+    HEADER_FONT = Font(bold=True)
+    HAS_OPENPYXL = True
 except ImportError:
+    HAS_OPENPYXL = False
     logging.warning("Module openpyxl non trouvé. Installation recommandée pour le formatage conditionnel.")
+try:
+    # Lecteur Excel natif (Rust), beaucoup plus rapide qu'openpyxl pour la lecture
+    import python_calamine
+    EXCEL_READ_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_READ_ENGINE = None
+try:
+    # Écriture Excel plus rapide qu'openpyxl, utilisée en priorité
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+except ImportError:
+    xlsxwriter = None
+try:
+    # Écriture CSV multi-thread à partir des données Arrow
+    import polars as pl
+except ImportError:
+    pl = None
+try:
+    # Colonnes de chaînes stockées au format Arrow (bien plus compact que des objets Python)
+    import pyarrow
+    RESULT_STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    RESULT_STRING_DTYPE = None
 
 # Configuration du logging
 logging.basicConfig(
@@ -21,82 +67,169 @@ logging.basicConfig(
     ]
 )
 
+# Nombre de requêtes simultanées vers l'API
+MAX_WORKERS = 24
+
+# Débit maximal vers l'API, partagé par tous les threads : un peu sous la limite documentée
+# (7 requêtes par seconde et par IP) pour absorber les réveils tardifs des threads
+API_RATE_LIMIT = 6
+_RATE_LOCK = threading.Lock()
+_next_request_time = 0.0
+
+def wait_for_rate_limit(rate=API_RATE_LIMIT):
+    """Attend le prochain créneau libre pour une requête vers l'API, afin que l'ensemble des threads
+    ne dépasse pas `rate` requêtes par seconde"""
+    global _next_request_time
+    with _RATE_LOCK:
+        now = time.monotonic()
+        slot = max(now, _next_request_time)
+        _next_request_time = slot + 1 / rate
+    if slot > now:
+        time.sleep(slot - now)
+
+def create_session(pool_size=MAX_WORKERS):
+    """Crée une session HTTP partagée (connexions réutilisées et relances automatiques)"""
+    session = requests.Session()
+    # Relancer les requêtes en cas de limite de débit ou d'erreur serveur
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+# Cache persistant des réponses brutes de l'API, partagé entre les exécutions
+CACHE_FILE = ".enrich_cache.sqlite"
+# Durée de validité d'une réponse en cache (l'état administratif et les dirigeants peuvent changer)
+CACHE_TTL = timedelta(days=30)
+_CACHE_LOCK = threading.Lock()
+
+# Expressions régulières compilées une seule fois au chargement du module
+_ABBREV = {
+    'BOULEVARD': 'BD',
+    'AVENUE': 'AV',
+    'ROUTE': 'RTE',
+    'RUE': 'R',
+    'SAINT': 'ST',
+    'SAINTE': 'STE',
+}
+# Une seule alternative pour toutes les abréviations (les plus longues d'abord : SAINTE avant SAINT)
+_RE_ABBREV = re.compile(r'\b(' + '|'.join(sorted(_ABBREV, key=len, reverse=True)) + r')\b')
+# Tout ce qui n'est pas un caractère de mot (ponctuation et espaces) devient un seul espace
+_RE_NON_WORD_RUN = re.compile(r'\W+')
+_RE_CP = re.compile(r'\b\d{5}\b')
+
+# Séparateurs après lesquels le texte est retiré du nom de l'entreprise
+_NAME_SEPARATORS = (' - ', ' | ', ' – ', ' : ', ' / ')
+
+# Types de voies conservés pour la recherche secondaire par adresse
+_STREET_TOKENS = frozenset(["rue", "avenue", "boulevard", "bd", "av", "rte", "route", "allée", "all", 
+                            "chemin", "impasse", "place", "quai"])
+_HAS_DIGIT = re.compile(r'\d').search
+
+# Mots-clés liés à l'installation électrique, recherchés en une seule passe
+_ELECTRICAL_KEYWORDS = ["ELEC", "ELECTR", "ELECTRIC", "ELECTRONIQUE", "CÂBLAGE", "CABLAGE", 
+                        "CABL", "INSTAL", "COURANT", "TELECOM", "ENERGI", "ENERGIE"]
+_RE_ELECTRICAL = re.compile('|'.join(map(re.escape, _ELECTRICAL_KEYWORDS)))
+
+# Villes françaises courantes qui pourraient apparaître dans les noms d'entreprises
+_CITIES = frozenset(["PARIS", "LYON", "MARSEILLE", "TOULOUSE", "NICE", "NANTES", "MONTPELLIER", 
+                     "STRASBOURG", "BORDEAUX", "LILLE", "RENNES", "REIMS", "TOULON", "GRENOBLE", 
+                     "DIJON", "ANGERS", "NÎMES", "VILLEURBANNE", "SAINT-DENIS", "ASNIÈRES", "CAEN",
+                     "SAINT-ÉTIENNE", "ROUEN", "NANCY", "ORLÉANS", "LIMOGES", "MULHOUSE", 
+                     "SAINT-PAUL", "ROUBAIX", "DUNKERQUE", "PERPIGNAN", "AMIENS", "BOULOGNE", 
+                     "BESANÇON", "BREST", "CANNES", "METZ", "ANTIBES", "HONFLEUR", "HYMER", "FECAMP"])
+
+# Description lisible des codes de tranche d'effectif
+_TRANCHE_EFFECTIF = {
+    "NN": "Unité non-employeuse ou présumée non-employeuse",
+    "00": "0 salarié (a employé des salariés)",
+    "01": "1 ou 2 salariés",
+    "02": "3 à 5 salariés",
+    "03": "6 à 9 salariés",
+    "11": "10 à 19 salariés",
+    "12": "20 à 49 salariés",
+    "21": "50 à 99 salariés",
+    "22": "100 à 199 salariés",
+    "31": "200 à 249 salariés",
+    "32": "250 à 499 salariés",
+    "41": "500 à 999 salariés",
+    "42": "1000 à 1999 salariés",
+    "51": "2000 à 4999 salariés",
+    "52": "5000 à 9999 salariés",
+    "53": "10000 salariés et plus"
+}
+
 def clean_address(address):
     """Nettoie et normalise une adresse pour la comparaison"""
     if not address or pd.isna(address):
         return ""
         
-    address = str(address).upper()
+    return _normalize_address(str(address))
+
+@lru_cache(maxsize=131072)
+def _normalize_address(address):
+    """Normalisation d'une adresse non vide (mise en cache, les mêmes rues reviennent souvent)"""
+    address = address.upper()
     
     # Remplacer les abréviations courantes
-    address = re.sub(r'\bBOULEVARD\b', 'BD', address)
-    address = re.sub(r'\bAVENUE\b', 'AV', address)
-    address = re.sub(r'\bROUTE\b', 'RTE', address)
-    address = re.sub(r'\bRUE\b', 'R', address)
-    address = re.sub(r'\bSAINT\b', 'ST', address)
-    address = re.sub(r'\bSAINTE\b', 'STE', address)
+    address = _RE_ABBREV.sub(lambda m: _ABBREV[m.group(1)], address)
     
-    # Supprimer les caractères spéciaux et harmoniser les espaces
-    address = re.sub(r'[^\w\s]', ' ', address)
-    address = re.sub(r'\s+', ' ', address).strip()
+    # Supprimer les caractères spéciaux et harmoniser les espaces en une seule passe
+    address = _RE_NON_WORD_RUN.sub(' ', address).strip()
     
     return address
 
-def addresses_match(original_address, api_address):
-    """Vérifie si deux adresses correspondent"""
-    # Si l'une des adresses est vide ou non définie, pas de correspondance
-    if not original_address or not api_address:
+# Adresse pré-traitée pour les comparaisons : forme normalisée, mots et code postal
+PreparedAddress = namedtuple('PreparedAddress', ['norm', 'words', 'cp'])
+
+def extract_postal_code(address):
+    """Extrait le code postal (5 chiffres) d'une adresse brute"""
+    cp = _RE_CP.search(str(address))
+    return cp.group(0) if cp else None
+
+def prepare_address(address):
+    """Pré-calcule ce qui sert à comparer une adresse (None si l'adresse est inexploitable)"""
+    # Une adresse vide, non définie ou réduite à un caractère spécial isolé est vide après nettoyage
+    norm = clean_address(address)
+    if not norm:
+        return None
+    
+    return PreparedAddress(norm, frozenset(norm.split()), extract_postal_code(address))
+
+def prepared_addresses_match(original, api_address):
+    """Vérifie si une adresse de l'API correspond à l'adresse d'origine pré-traitée par prepare_address"""
+    if original is None or not api_address:
         return False
-        
-    # Si l'adresse originale est juste un point ou un caractère spécial isolé
-    if original_address.strip() in ["·", ".", "-", "/"]:
+    
+    # Si les codes postaux sont différents, pas de correspondance
+    # (vérifié avant la normalisation, bien plus coûteuse)
+    api_cp = extract_postal_code(api_address)
+    if original.cp and api_cp and original.cp != api_cp:
         return False
     
-    # Nettoyer les deux adresses
-    norm_original = clean_address(original_address)
+    # Si l'adresse de l'API est vide après nettoyage
     norm_api = clean_address(api_address)
-    
-    # Si l'une des adresses normalisées est vide après nettoyage
-    if not norm_original or not norm_api:
+    if not norm_api:
         return False
     
     # Vérifier si une adresse est contenue dans l'autre
-    if norm_original in norm_api or norm_api in norm_original:
+    if original.norm in norm_api or norm_api in original.norm:
         return True
-        
-    # Comparer les mots significatifs
-    original_words = set(norm_original.split())
-    api_words = set(norm_api.split())
-    common_words = original_words.intersection(api_words)
     
-    # Extraire les codes postaux
-    original_cp = re.search(r'\b\d{5}\b', original_address)
-    api_cp = re.search(r'\b\d{5}\b', api_address)
-    
-    # Si les codes postaux sont différents, pas de correspondance
-    if original_cp and api_cp and original_cp.group(0) != api_cp.group(0):
-        return False
-        
     # Si au moins 30% des mots correspondent et il y a au moins 2 mots en commun
-    return len(common_words) >= max(2, len(original_words) * 0.3)
+    common_words = original.words.intersection(norm_api.split())
+    return len(common_words) >= max(2, len(original.words) * 0.3)
 
-def search_company(company_name, address, token):
-    """Recherche une entreprise dans l'API Recherche d'Entreprises"""
-    logging.info(f"Recherche pour: {company_name}, adresse: {address}")
-    
-    # Traiter le nom de l'entreprise pour améliorer les correspondances
+def addresses_match(original_address, api_address):
+    """Vérifie si deux adresses correspondent"""
+    return prepared_addresses_match(prepare_address(original_address), api_address)
+
+def simplify_company_name(company_name):
+    """Simplifie un nom d'entreprise pour la recherche (texte après séparateur et ville finale retirés)"""
     simplified_name = company_name
     
-    # Liste des villes françaises courantes qui pourraient apparaître dans les noms d'entreprises
-    cities = ["PARIS", "LYON", "MARSEILLE", "TOULOUSE", "NICE", "NANTES", "MONTPELLIER", 
-             "STRASBOURG", "BORDEAUX", "LILLE", "RENNES", "REIMS", "TOULON", "GRENOBLE", 
-             "DIJON", "ANGERS", "NÎMES", "VILLEURBANNE", "SAINT-DENIS", "ASNIÈRES", "CAEN",
-             "SAINT-ÉTIENNE", "ROUEN", "NANCY", "ORLÉANS", "LIMOGES", "MULHOUSE", 
-             "SAINT-PAUL", "ROUBAIX", "DUNKERQUE", "PERPIGNAN", "AMIENS", "BOULOGNE", 
-             "BESANÇON", "BREST", "CANNES", "METZ", "ANTIBES", "HONFLEUR", "HYMER", "FECAMP"]
-    
     # Supprimer le texte après les séparateurs courants pour améliorer la recherche
-    for separator in [' - ', ' | ', ' – ', ' – ', ' : ', ' / ']:
+    for separator in _NAME_SEPARATORS:
         if separator in simplified_name:
             simplified_name = simplified_name.split(separator)[0].strip()
             logging.debug(f"Nom simplifié (séparateur): {simplified_name}")
@@ -106,9 +239,9 @@ def search_company(company_name, address, token):
     words = simplified_name.upper().split()
     if len(words) > 1:
         # Vérifier si le ou les derniers mots correspondent à une ville
-        if words[-1] in cities or ' '.join(words[-2:]).upper() in cities or (len(words) > 2 and ' '.join(words[-3:]).upper() in cities):
+        if words[-1] in _CITIES or ' '.join(words[-2:]) in _CITIES or (len(words) > 2 and ' '.join(words[-3:]) in _CITIES):
             # Si un des derniers mots est "ST" suivi d'un nom de ville
-            if len(words) > 2 and words[-2] in ["ST", "SAINT"] and words[-1] in cities:
+            if len(words) > 2 and words[-2] in ("ST", "SAINT") and words[-1] in _CITIES:
                 # Garder "ST" et le nom de ville si c'est le nom de l'entreprise
                 if len(words) > 3:
                     simplified_name = ' '.join(words[:-2]).strip()
@@ -116,12 +249,25 @@ def search_company(company_name, address, token):
             else:
                 # Enlever juste le nom de la ville
                 for i in range(1, min(4, len(words))):
-                    city_candidate = ' '.join(words[-i:]).upper()
-                    if city_candidate in cities:
+                    city_candidate = ' '.join(words[-i:])
+                    if city_candidate in _CITIES:
                         simplified_name = ' '.join(words[:-i]).strip()
                         logging.debug(f"Nom simplifié (ville): {simplified_name}")
                         break
     
+    return simplified_name
+
+def search_company(company_name, address, token, session=None, simplified_name=None, cache=None, refresh_cache=False):
+    """Recherche une entreprise dans l'API Recherche d'Entreprises"""
+    # Utiliser la session partagée si elle est fournie
+    http = session if session is not None else requests
+    
+    logging.info(f"Recherche pour: {company_name}, adresse: {address}")
+    
+    # Traiter le nom de l'entreprise pour améliorer les correspondances (sauf s'il a déjà été simplifié)
+    if simplified_name is None:
+        simplified_name = simplify_company_name(company_name)
+    
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/json"
@@ -139,10 +285,9 @@ def search_company(company_name, address, token):
     
     try:
         # Faire la requête à l'API
-        response = requests.get(base_url, headers=headers, params=params, timeout=30)
+        status_code, data = api_search(http, base_url, params, headers, cache, refresh_cache)
         
-        if response.status_code == 200:
-            data = response.json()
+        if status_code == 200:
             results = data.get('results', [])
             
             if not results:
@@ -153,57 +298,40 @@ def search_company(company_name, address, token):
                     logging.info(f"Tentative de recherche secondaire par adresse pour {company_name}")
                     # Extraire les éléments numériques de l'adresse pour la recherche
                     address_parts = address.split()
-                    address_search = " ".join([p for p in address_parts if any(c.isdigit() for c in p) or p.lower() in ["rue", "avenue", "boulevard", "bd", "av", "rte", "route", "allée", "all", "chemin", "impasse", "place", "quai"]])
+                    address_search = " ".join(p for p in address_parts if _HAS_DIGIT(p) or p.lower() in _STREET_TOKENS)
                     
                     if address_search.strip():
                         params["q"] = address_search
                         logging.debug(f"Recherche par adresse: {address_search}")
-                        address_response = requests.get(base_url, headers=headers, params=params, timeout=30)
+                        address_status_code, address_data = api_search(http, base_url, params, headers,
+                                                                       cache, refresh_cache)
                         
-                        if address_response.status_code == 200:
-                            address_data = address_response.json()
+                        if address_status_code == 200:
                             address_results = address_data.get('results', [])
                             
                             if address_results:
                                 logging.info(f"✓ {len(address_results)} résultat(s) trouvé(s) par recherche d'adresse")
                                 
-                                # Fonction pour calculer la similarité entre deux chaînes
-                                def string_similarity(s1, s2):
-                                    s1 = s1.upper()
-                                    s2 = s2.upper()
-                                    # Nombre de caractères en commun
-                                    common = sum(c1 == c2 for c1, c2 in zip(s1, s2))
-                                    # Plus la longueur est similaire, meilleur est le score
-                                    length_diff = 1 - abs(len(s1) - len(s2)) / max(len(s1), len(s2))
-                                    # Score combiné
-                                    return common + length_diff * 5
-                                
-                                # Mots-clés liés à l'installation électrique
-                                electrical_keywords = ["ELEC", "ELECTR", "ELECTRIC", "ELECTRONIQUE", "CÂBLAGE", "CABLAGE", 
-                                                      "CABL", "INSTAL", "COURANT", "TELECOM", "ENERGI", "ENERGIE"]
-                                
                                 # Trouver le résultat le plus pertinent
                                 best_match = None
                                 best_score = -1
                                 best_activity_match = None
                                 best_activity_score = -1
+                                company_name_upper = company_name.upper()
                                 
                                 for result in address_results:
                                     result_name = result.get('nom_complet', '')
                                     description = result.get('objet_social', '') or result.get('description', '')
                                     activite = result.get('activite_principale', '') or ''
-                                    score = string_similarity(company_name, result_name)
+                                    # Similarité des noms (0 à 100)
+                                    score = fuzz.WRatio(company_name_upper, result_name.upper())
                                     
                                     # Vérifier si le nom ou la description contient des mots-clés liés à l'électricité
-                                    has_electrical_keyword = False
                                     combined_text = (result_name + ' ' + description + ' ' + activite).upper()
-                                    for keyword in electrical_keywords:
-                                        if keyword in combined_text:
-                                            has_electrical_keyword = True
-                                            break
+                                    has_electrical_keyword = _RE_ELECTRICAL.search(combined_text) is not None
                                     
                                     # Si le score est suffisamment bon (nom similaire)
-                                    if score > 10 and score > best_score:
+                                    if score > 60 and score > best_score:
                                         best_score = score
                                         best_match = result
                                     
@@ -234,7 +362,7 @@ def search_company(company_name, address, token):
                             else:
                                 return None
                         else:
-                            logging.error(f"Erreur API recherche par adresse ({address_response.status_code}): {address_response.text}")
+                            logging.error(f"Erreur API recherche par adresse ({address_status_code}): {address_data}")
                             return None
                     else:
                         return None
@@ -245,10 +373,13 @@ def search_company(company_name, address, token):
             best_match = None
             best_match_score = 0
             
+            # L'adresse d'origine est la même pour tous les résultats : la préparer une seule fois
+            original_address = prepare_address(address)
+            
             for result in results:
                 # Vérifier la correspondance d'adresse
                 api_address = result.get('siege', {}).get('adresse', '')
-                match = addresses_match(address, api_address)
+                match = prepared_addresses_match(original_address, api_address)
                 
                 # Si c'est une correspondance et qu'on n'a pas encore trouvé de correspondance
                 if match and best_match is None:
@@ -269,10 +400,11 @@ def search_company(company_name, address, token):
                 nom_dirigeant = ""
                 prenom_dirigeant = ""
                 qualite_dirigeant = ""
-                annee_naissance_max = "0"
+                annee_naissance_max = 0
+                annee_actuelle = datetime.now().year
                 
-                # Liste pour stocker tous les dirigeants
-                autres_dirigeants = []
+                # Tous les dirigeants, indexés par identifiant (nom et premier prénom)
+                dirigeants_par_id = {}
                 
                 if dirigeants:
                     dirigeants_info = []
@@ -315,27 +447,24 @@ def search_company(company_name, address, token):
                             dirigeant_info['nom'] = nom
                             dirigeant_info['identifiant'] = f"{nom}_{premier_prenom}"
                         
-                        # Calculer l'âge si année de naissance disponible
-                        if annee:
-                            try:
-                                annee_actuelle = datetime.now().year
-                                dirigeant_info['age'] = f"{annee_actuelle - int(annee)} ans"
-                            except (ValueError, TypeError):
-                                pass
+                        # Convertir l'année de naissance en entier une seule fois (0 si absente ou invalide)
+                        try:
+                            annee_int = int(annee) if annee else 0
+                        except (ValueError, TypeError):
+                            annee_int = 0
                         
-                        # Vérifier si ce dirigeant (même nom et premier prénom) existe déjà dans la liste
-                        dirigeant_existant = False
-                        for dir_existant in autres_dirigeants:
-                            if dir_existant['identifiant'] == dirigeant_info['identifiant']:
-                                dirigeant_existant = True
-                                # Si le dirigeant existe déjà mais avec moins d'informations, mettre à jour
-                                if len(dir_existant['prenoms']) < len(dirigeant_info['prenoms']):
-                                    dir_existant.update(dirigeant_info)
-                                break
+                        # Calculer l'âge si année de naissance disponible
+                        if annee_int:
+                            dirigeant_info['age'] = f"{annee_actuelle - annee_int} ans"
                         
-                        # Ajouter à la liste des dirigeants uniquement s'il n'existe pas déjà
-                        if not dirigeant_existant:
-                            autres_dirigeants.append(dirigeant_info)
+                        # Vérifier si ce dirigeant (même nom et premier prénom) existe déjà
+                        dir_existant = dirigeants_par_id.get(dirigeant_info['identifiant'])
+                        if dir_existant is None:
+                            # Ajouter le dirigeant uniquement s'il n'existe pas déjà
+                            dirigeants_par_id[dirigeant_info['identifiant']] = dirigeant_info
+                        elif len(dir_existant['prenoms']) < len(dirigeant_info['prenoms']):
+                            # Si le dirigeant existe déjà mais avec moins d'informations, mettre à jour
+                            dir_existant.update(dirigeant_info)
                         
                         # Prendre le premier dirigeant si aucun n'est trouvé
                         if not nom_dirigeant and not prenom_dirigeant and nom:
@@ -344,8 +473,8 @@ def search_company(company_name, address, token):
                             qualite_dirigeant = qualite
                         
                         # Si l'année est présente et plus récente (dirigeant plus jeune)
-                        if annee and (not annee_naissance_max or annee > annee_naissance_max):
-                            annee_naissance_max = annee
+                        if annee_int > annee_naissance_max:
+                            annee_naissance_max = annee_int
                             nom_dirigeant = nom
                             prenom_dirigeant = premier_prenom
                             qualite_dirigeant = qualite
@@ -365,43 +494,22 @@ def search_company(company_name, address, token):
                     
                     dirigeants_str = " | ".join(dirigeants_info)
                 
-                # Vérifier la correspondance d'adresse
+                # La correspondance d'adresse a déjà été évaluée lors du choix du résultat
                 api_address = best_match.get('siege', {}).get('adresse', '')
-                address_match = addresses_match(address, api_address)
+                address_match = best_match_score > 0
                 
                 # Récupérer la tranche d'effectif correctement
                 tranche_effectif_code = best_match.get('siege', {}).get('tranche_effectif_salarie', '')
                 
                 # Convertir le code tranche d'effectif en description lisible
-                tranche_effectif_map = {
-                    "NN": "Unité non-employeuse ou présumée non-employeuse",
-                    "00": "0 salarié (a employé des salariés)",
-                    "01": "1 ou 2 salariés",
-                    "02": "3 à 5 salariés",
-                    "03": "6 à 9 salariés",
-                    "11": "10 à 19 salariés",
-                    "12": "20 à 49 salariés",
-                    "21": "50 à 99 salariés",
-                    "22": "100 à 199 salariés",
-                    "31": "200 à 249 salariés",
-                    "32": "250 à 499 salariés",
-                    "41": "500 à 999 salariés",
-                    "42": "1000 à 1999 salariés",
-                    "51": "2000 à 4999 salariés",
-                    "52": "5000 à 9999 salariés",
-                    "53": "10000 salariés et plus"
-                }
-                
-                tranche_effectif_desc = tranche_effectif_map.get(tranche_effectif_code, "null")
+                tranche_effectif_desc = _TRANCHE_EFFECTIF.get(tranche_effectif_code, "null")
                 
                 # Calculer l'âge du dirigeant le plus jeune s'il y a une année de naissance
                 age = ""
-                if annee_naissance_max and annee_naissance_max != "0":
-                    try:
-                        annee_actuelle = datetime.now().year
-                        age = f"{annee_actuelle - int(annee_naissance_max)} ans"
-                    except (ValueError, TypeError):
-                        age = ""
+                if annee_naissance_max:
+                    age = f"{annee_actuelle - annee_naissance_max} ans"
+                
+                autres_dirigeants = list(dirigeants_par_id.values())
                 
                 # Préparer la liste des autres dirigeants à retourner
                 autres_dirigeants_result = []
@@ -450,14 +558,227 @@ def search_company(company_name, address, token):
             return None
             
         else:
-            logging.error(f"Erreur API ({response.status_code}): {response.text}")
+            logging.error(f"Erreur API ({status_code}): {data}")
             return None
             
     except Exception as e:
         logging.error(f"Exception lors de la recherche: {str(e)}")
         return None
 
-def enrich_excel_file(input_file, output_file, token):
+def search_key(simplified_name, company_name, address):
+    """Clé de déduplication des recherches, calculée à partir des entrées exactes de search_company :
+    la requête envoyée à l'API, le nom comparé lors de la recherche secondaire et l'adresse"""
+    address = '' if pd.isna(address) else str(address).strip()
+    key = f"{simplified_name}|{company_name.strip().upper()}|{address}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def open_cache(path=CACHE_FILE):
+    """Ouvre (ou crée) le cache SQLite des réponses de l'API, en supprimant les réponses expirées"""
+    cache = sqlite3.connect(path, check_same_thread=False)
+    with cache:
+        # Ancienne table des résultats déjà calculés (âges figés, dirigeants jamais rafraîchis)
+        cache.execute("DROP TABLE IF EXISTS results")
+        cache.execute("CREATE TABLE IF NOT EXISTS responses "
+                      "(key TEXT PRIMARY KEY, payload TEXT NOT NULL, fetched_at TEXT NOT NULL)")
+        cache.execute("DELETE FROM responses WHERE fetched_at < ?", ((datetime.now() - CACHE_TTL).isoformat(),))
+    return cache
+
+def api_search(http, url, params, headers, cache=None, refresh_cache=False):
+    """Interroge l'API et renvoie le code HTTP avec le JSON de la réponse (ou son texte en cas d'erreur) ;
+    les réponses valides sont mises en cache telles quelles et réutilisées tant qu'elles n'ont pas expiré"""
+    key = hashlib.sha1(f"{url}?{json.dumps(params, sort_keys=True)}".encode('utf-8')).hexdigest()
+    
+    if cache is not None and not refresh_cache:
+        with _CACHE_LOCK:
+            row = cache.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            logging.debug(f"Réponse en cache pour: {params.get('q')}")
+            return 200, json.loads(row[0])
+    
+    wait_for_rate_limit()
+    response = http.get(url, headers=headers, params=params, timeout=30)
+    if response.status_code != 200:
+        # Les erreurs (quota dépassé, panne...) ne sont pas mises en cache
+        return response.status_code, response.text
+    
+    data = response.json()
+    if cache is not None:
+        with _CACHE_LOCK, cache:
+            cache.execute("INSERT OR REPLACE INTO responses (key, payload, fetched_at) VALUES (?, ?, ?)",
+                          (key, json.dumps(data, ensure_ascii=False), datetime.now().isoformat()))
+    return 200, data
+
+# Colonnes de résultats alimentées par les clés du résultat de search_company
+# (sans CA ni Capital que l'API ne fournit pas, et sans Date_Creation)
+RESULT_KEY_TO_COL = {
+    'siren': 'SIREN',
+    'nom_raison_sociale': 'Nom_Raison_Sociale',
+    'adresse': 'Adresse',
+    'etat_administratif': 'Etat_Administratif',
+    'tranche_effectif': 'Tranche_Effectif',
+    'annee_creation': 'Annee_Creation',
+    'nom_dirigeant': 'Nom_Dirigeant',
+    'prenom_dirigeant': 'Prenom_Dirigeant',
+    'qualite_dirigeant': 'Qualite_Dirigeant',
+    'age_dirigeant': 'Age_Dirigeant',
+    'match_adresse': 'Match_Adresse'
+}
+
+# Suffixes des colonnes de chaque dirigeant alternatif (sans colonne de type)
+DIRIGEANT_KEY_TO_SUFFIX = {
+    'nom': 'Nom',
+    'prenoms': 'Prenom',
+    'qualite': 'Qualite',
+    'age': 'Age'
+}
+
+# Nombre maximum de dirigeants alternatifs
+MAX_AUTRES_DIRIGEANTS = 5
+
+def get_result_columns():
+    """Liste ordonnée de toutes les colonnes de résultats"""
+    result_columns = list(RESULT_KEY_TO_COL.values())
+    for i in range(1, MAX_AUTRES_DIRIGEANTS + 1):
+        result_columns.extend(f'Dirigeant{i}_{suffix}' for suffix in DIRIGEANT_KEY_TO_SUFFIX.values())
+    return result_columns
+
+def result_to_record(result):
+    """Convertit un résultat de search_company en une ligne des colonnes de sortie"""
+    record = {col: result.get(key) for key, col in RESULT_KEY_TO_COL.items()}
+    
+    # Colonnes des dirigeants alternatifs
+    for i, dirigeant in enumerate(result.get('autres_dirigeants', [])[:MAX_AUTRES_DIRIGEANTS], start=1):
+        for key, suffix in DIRIGEANT_KEY_TO_SUFFIX.items():
+            record[f'Dirigeant{i}_{suffix}'] = dirigeant[key]
+    
+    return record
+
+def to_polars(df):
+    """Convertit une seule fois le DataFrame en DataFrame Polars (Arrow), partagé par les écritures ;
+    renvoie None si Polars n'est pas disponible ou si la conversion échoue"""
+    if pl is None:
+        return None
+    try:
+        return pl.from_pandas(df)
+    except Exception as e:
+        logging.debug(f"Conversion en DataFrame Polars impossible, utilisation de pandas: {str(e)}")
+        return None
+
+def match_masks(df, match_pos, pl_df=None):
+    """Renvoie les masques booléens (numpy) des lignes dont la colonne d'indice match_pos vaut "Oui" et "Non",
+    calculés sur la colonne Arrow si le DataFrame Polars est fourni"""
+    if pl_df is not None:
+        match_values = pl_df.to_series(match_pos)
+        return ((match_values == "Oui").fill_null(False).to_numpy(),
+                (match_values == "Non").fill_null(False).to_numpy())
+    
+    match_values = df.iloc[:, match_pos]
+    return ((match_values == "Oui").to_numpy(dtype=bool, na_value=False),
+            (match_values == "Non").to_numpy(dtype=bool, na_value=False))
+
+def write_excel_openpyxl(df, output_file, match_col_idx, pl_df=None):
+    """Écrit le DataFrame dans un fichier Excel ligne par ligne (mode write-only d'openpyxl),
+    en colorant la colonne Match_Adresse et en surlignant les lignes dont l'adresse ne correspond pas"""
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Sheet1')
+    
+    # En-tête en gras, comme avec DataFrame.to_excel
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = HEADER_FONT
+        header.append(cell)
+    worksheet.append(header)
+    
+    # Lignes à colorer, calculées une seule fois sur toute la colonne Match_Adresse
+    match_pos = match_col_idx - 1
+    oui_mask, non_mask = match_masks(df, match_pos, pl_df)
+    has_non = non_mask.any()
+    
+    # Surligner en rouge clair les lignes sans correspondance d'adresse avec une seule règle de format
+    # conditionnel, sur toutes les colonnes sauf Match_Adresse qui garde son propre remplissage
+    last_row = len(df) + 1
+    last_col = len(df.columns)
+    row_ranges = []
+    if match_col_idx > 1:
+        row_ranges.append(f"A2:{get_column_letter(match_col_idx - 1)}{last_row}")
+    if match_col_idx < last_col:
+        row_ranges.append(f"{get_column_letter(match_col_idx + 1)}2:{get_column_letter(last_col)}{last_row}")
+    if row_ranges and has_non:
+        match_letter = get_column_letter(match_col_idx)
+        worksheet.conditional_formatting.add(' '.join(row_ranges),
+                                             FormulaRule(formula=[f'${match_letter}2="Non"'], fill=FILL_NON_ROW))
+    
+    rows = df.itertuples(index=False, name=None)
+    for values, is_oui, is_non in zip(rows, oui_mask, non_mask):
+        # Les valeurs manquantes deviennent des cellules vides
+        values = [None if pd.isna(value) else value for value in values]
+        
+        # Seule la cellule Match_Adresse porte un style
+        if is_oui or is_non:
+            cell = WriteOnlyCell(worksheet, value=values[match_pos])
+            cell.fill = FILL_OUI if is_oui else FILL_NON
+            values[match_pos] = cell
+        
+        worksheet.append(values)
+    
+    workbook.save(output_file)
+
+def write_excel_xlsxwriter(df, output_file, match_col_idx, pl_df=None):
+    """Écrit le DataFrame dans un fichier Excel avec xlsxwriter ; la coloration de Match_Adresse
+    et le surlignage des lignes sans correspondance sont portés par des règles de format conditionnel"""
+    # Sans conversion automatique des URL en liens : xlsxwriter viderait les URL de plus de 2079 caractères
+    # et celles au-delà de 65 530 par feuille, alors qu'openpyxl les écrit telles quelles
+    with pd.ExcelWriter(output_file, engine='xlsxwriter',
+                        engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
+        df.to_excel(writer, index=False, sheet_name='Sheet1')
+        
+        workbook = writer.book
+        worksheet = writer.sheets['Sheet1']
+        
+        # Vert clair pour les correspondances, rouge clair pour les non-correspondances
+        green = workbook.add_format({'bg_color': '#C6EFCE'})
+        red = workbook.add_format({'bg_color': '#FFC7CE'})
+        light_red = workbook.add_format({'bg_color': '#FFEBEE'})
+        
+        # Lignes de données (0 = en-tête) et colonne Match_Adresse, en indices xlsxwriter
+        first_row, last_row = 1, len(df)
+        match_col = match_col_idx - 1
+        match_letter = xl_col_to_name(match_col)
+        
+        # N'ajouter que les règles qui s'appliquent à au moins une ligne
+        oui_mask, non_mask = match_masks(df, match_col, pl_df)
+        
+        # Les règles ajoutées en premier sont prioritaires : la cellule Match_Adresse garde sa couleur
+        if oui_mask.any():
+            worksheet.conditional_format(first_row, match_col, last_row, match_col,
+                                         {'type': 'cell', 'criteria': '==', 'value': '"Oui"', 'format': green})
+        if non_mask.any():
+            worksheet.conditional_format(first_row, match_col, last_row, match_col,
+                                         {'type': 'cell', 'criteria': '==', 'value': '"Non"', 'format': red})
+            
+            # Surligner toute la ligne en rouge clair si pas de correspondance d'adresse
+            worksheet.conditional_format(first_row, 0, last_row, len(df.columns) - 1,
+                                         {'type': 'formula', 'criteria': f'=${match_letter}2="Non"', 'format': light_red})
+
+def polars_csv_compatible(pl_df):
+    """Indique si Polars écrit chaque colonne en CSV exactement comme pandas : c'est le cas des chaînes
+    et des entiers, mais pas des dates, booléens ou flottants, qui sont formatés différemment"""
+    return all(dtype == pl.String or dtype == pl.Null or dtype.is_integer() for dtype in pl_df.dtypes)
+
+def write_csv(df, csv_path, pl_df=None):
+    """Écrit le DataFrame en CSV (UTF-8 avec BOM pour Excel), avec sa conversion Polars (to_polars)
+    si l'appelant la fournit et si le résultat est identique à celui de pandas, sinon avec pandas"""
+    if pl_df is not None and polars_csv_compatible(pl_df):
+        try:
+            pl_df.write_csv(csv_path, include_bom=True)
+            return
+        except Exception as e:
+            logging.debug(f"Écriture CSV avec Polars impossible, utilisation de pandas: {str(e)}")
+    
+    df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+
+def enrich_excel_file(input_file, output_file, token, use_cache=True, workers=MAX_WORKERS, refresh_cache=False):
     """Enrichit un fichier Excel avec des données d'entreprises"""
     try:
         # Vérifier l'existence du fichier
@@ -467,7 +788,7 @@ def enrich_excel_file(input_file, output_file, token):
             
         # Lire le fichier Excel
         try:
-            df = pd.read_excel(input_file)
+            df = pd.read_excel(input_file, engine=EXCEL_READ_ENGINE)
             logging.info(f"Fichier Excel chargé: {len(df)} lignes")
             logging.info(f"Colonnes: {', '.join(df.columns)}")
             
@@ -495,24 +816,9 @@ def enrich_excel_file(input_file, output_file, token):
             logging.error(f"Colonnes manquantes: {', '.join(missing_columns)}")
             return False
             
-        # Préparer les colonnes de résultats (sans CA ni Capital que l'API ne fournit pas, et sans Date_Creation)
-        result_columns = ['SIREN', 'Nom_Raison_Sociale', 'Adresse', 'Etat_Administratif', 
-                        'Tranche_Effectif', 'Annee_Creation',
-                        'Nom_Dirigeant', 'Prenom_Dirigeant', 'Qualite_Dirigeant', 'Age_Dirigeant', 'Match_Adresse']
-        
-        # Ajouter des colonnes pour les dirigeants alternatifs (5 maximum)
-        for i in range(1, 6):
-            result_columns.extend([
-                f'Dirigeant{i}_Nom',
-                f'Dirigeant{i}_Prenom',
-                f'Dirigeant{i}_Qualite',
-                f'Dirigeant{i}_Age'
-            ])
-        # Remarque: nous n'ajoutons pas de colonnes de type pour les dirigeants
+        # Préparer les colonnes de résultats (dirigeants alternatifs inclus, 5 maximum)
+        result_columns = get_result_columns()
         
-        for col in result_columns:
-            df[col] = None
-            
         # Créer un fichier CSV pour les résultats
         now = datetime.now()
         date_time_str = now.strftime("%Y%m%d_%H%M%S")
@@ -529,102 +835,124 @@ def enrich_excel_file(input_file, output_file, token):
         matches = 0
         address_matches = 0
         
-        for idx, row in df.iterrows():
-            company_name = row.get('Company', '')
-            address = row.get('Address', '')
-            
-            if pd.isna(company_name) or not company_name.strip():
-                logging.warning(f"Ligne {idx+1}: Nom d'entreprise vide, ignoré")
-                continue
-                
-            logging.info(f"Traitement de l'entreprise {idx+1}/{total_rows}: {company_name}")
-            
-            # Rechercher l'entreprise
-            result = search_company(company_name, address, token)
-            
-            if result:
-                matches += 1
-                # Remplir les colonnes de résultats
-                df.at[idx, 'SIREN'] = result['siren']
-                df.at[idx, 'Nom_Raison_Sociale'] = result['nom_raison_sociale']
-                df.at[idx, 'Adresse'] = result['adresse']
-                df.at[idx, 'Etat_Administratif'] = result['etat_administratif']
-                df.at[idx, 'Tranche_Effectif'] = result['tranche_effectif']
-                df.at[idx, 'Annee_Creation'] = result['annee_creation']
-                df.at[idx, 'Nom_Dirigeant'] = result['nom_dirigeant']
-                df.at[idx, 'Prenom_Dirigeant'] = result['prenom_dirigeant']
-                df.at[idx, 'Qualite_Dirigeant'] = result['qualite_dirigeant']
-                df.at[idx, 'Age_Dirigeant'] = result['age_dirigeant']
-                df.at[idx, 'Match_Adresse'] = result['match_adresse']
+        # Lignes de résultats indexées comme le DataFrame d'origine
+        records = {}
+        
+        cache = open_cache() if use_cache else None
+        
+        try:
+            with create_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+                # Simplifier chaque nom d'entreprise distinct une seule fois, avant les recherches
+                simplified_names = {name: simplify_company_name(name)
+                                    for name in df['Company'].dropna().unique() if isinstance(name, str)}
                 
-                # Remplir les colonnes des dirigeants alternatifs
-                autres_dirigeants = result.get('autres_dirigeants', [])
-                for i, dirigeant in enumerate(autres_dirigeants, start=1):
-                    if i > 5:  # Limiter à 5 dirigeants alternatifs
-                        break
+                # Lancer les recherches en parallèle (une seule requête par couple nom/adresse identique)
+                futures = {}
+                pending = {}
+                for idx, row in df.iterrows():
+                    company_name = row.get('Company', '')
+                    address = row.get('Address', '')
+                    
+                    if pd.isna(company_name) or not company_name.strip():
+                        logging.warning(f"Ligne {idx+1}: Nom d'entreprise vide, ignoré")
+                        continue
                     
-                    df.at[idx, f'Dirigeant{i}_Nom'] = dirigeant['nom']
-                    df.at[idx, f'Dirigeant{i}_Prenom'] = dirigeant['prenoms']
-                    df.at[idx, f'Dirigeant{i}_Qualite'] = dirigeant['qualite']
-                    df.at[idx, f'Dirigeant{i}_Age'] = dirigeant['age']
-                    # Ne pas ajouter de colonne de type
+                    simplified_name = simplified_names[company_name]
+                    key = search_key(simplified_name, company_name, address)
+                    future = pending.get(key)
+                    if future is None:
+                        future = executor.submit(search_company, company_name, address, token, session,
+                                                 simplified_name, cache, refresh_cache)
+                        pending[key] = future
+                        futures[future] = []
+                    futures[future].append((idx, company_name))
                 
-                if result['match_adresse'] == "Oui":
-                    address_matches += 1
-                    logging.info(f"✓ Correspondance trouvée: SIREN {result['siren']} | Adresse: correspondante")
-                else:
-                    logging.info(f"! Correspondance trouvée: SIREN {result['siren']} | Adresse: différente")
-            else:
-                logging.warning(f"✗ Aucune correspondance trouvée pour {company_name}")
+                # Récupérer les résultats au fur et à mesure
+                for future in as_completed(futures):
+                    result = future.result()
+                    
+                    for idx, company_name in futures[future]:
+                        logging.info(f"Traitement de l'entreprise {idx+1}/{total_rows}: {company_name}")
+                        
+                        if result:
+                            matches += 1
+                            records[idx] = result_to_record(result)
+                        
+                            if result['match_adresse'] == "Oui":
+                                address_matches += 1
+                                logging.info(f"✓ Correspondance trouvée: SIREN {result['siren']} | Adresse: correspondante")
+                            else:
+                                logging.info(f"! Correspondance trouvée: SIREN {result['siren']} | Adresse: différente")
+                        else:
+                            logging.warning(f"✗ Aucune correspondance trouvée pour {company_name}")
+        finally:
+            # Fermer le cache même si une recherche a levé une exception
+            if cache is not None:
+                cache.close()
+        
+        # Ajouter toutes les colonnes de résultats en une seule fois (en remplaçant celles déjà présentes)
+        results_df = pd.DataFrame([records.get(idx, {}) for idx in df.index], index=df.index, columns=result_columns)
+        if RESULT_STRING_DTYPE is not None:
+            # Toutes les colonnes de résultats sont des chaînes (SIREN et année compris, ce sont des identifiants)
+            results_df = results_df.astype(RESULT_STRING_DTYPE)
+        df[result_columns] = results_df
         
         # Afficher les statistiques
         if total_rows > 0:
             match_percent = (matches/total_rows*100)
             address_match_percent = (address_matches/matches*100) if matches > 0 else 0
             
-            logging.info(f"\nRésumé du traitement:")
-            logging.info(f"- Total des entreprises: {total_rows}")
-            logging.info(f"- Entreprises trouvées: {matches}/{total_rows} ({match_percent:.1f}%)")
-            logging.info(f"- Adresses correspondantes: {address_matches}/{matches} ({address_match_percent:.1f}%)")
+            logging.info(
+                "\nRésumé du traitement:\n"
+                "- Total des entreprises: %d\n"
+                "- Entreprises trouvées: %d/%d (%.1f%%)\n"
+                "- Adresses correspondantes: %d/%d (%.1f%%)",
+                total_rows,
+                matches, total_rows, match_percent,
+                address_matches, matches, address_match_percent
+            )
             
-        # Sauvegarder les résultats avec formatage conditionnel si openpyxl est disponible
-        try:
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
+        # Convertir une seule fois en Polars (Arrow) pour le CSV et les masques du formatage Excel
+        pl_df = to_polars(df)
+        
+        # Sauvegarder aussi en CSV, en parallèle de l'écriture Excel
+        # (en série en mode debug, pour que les logs restent ordonnés)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            write_csv(df, csv_path, pl_df)
+            csv_future = None
+        else:
+            csv_executor = ThreadPoolExecutor(max_workers=1)
+            csv_future = csv_executor.submit(write_csv, df, csv_path, pl_df)
+            csv_executor.shutdown(wait=False)
+        
+        # Sauvegarder les résultats avec formatage conditionnel (xlsxwriter, sinon openpyxl)
+        if xlsxwriter is None and not HAS_OPENPYXL:
+            logging.warning("Modules xlsxwriter et openpyxl non disponibles, formatage conditionnel désactivé")
+            df.to_excel(output_file, index=False)
+        else:
+            # Écrire dans un fichier temporaire qui ne remplace le fichier de sortie qu'une fois complet
+            # (en gardant l'extension Excel, que pandas vérifie pour choisir le moteur)
+            root, ext = os.path.splitext(output_file)
+            tmp_output_file = f"{root}.tmp{ext}"
+            try:
+                # Trouver l'index (à partir de 1, comme dans Excel) de la colonne Match_Adresse
+                match_col_idx = df.columns.get_loc('Match_Adresse') + 1
                 
-                # Vérifier si openpyxl est disponible
-                if 'openpyxl' in sys.modules:
-                    # Appliquer le formatage conditionnel
-                    workbook = writer.book
-                    worksheet = writer.sheets['Sheet1']
-                    
-                    # Trouver l'index de la colonne Match_Adresse
-                    match_col_idx = result_columns.index('Match_Adresse') + len(required_columns) + 1
-                    
-                    # Appliquer une couleur verte pour les correspondances et rouge pour les non-correspondances
-                    for row_idx in range(2, len(df) + 2):  # +2 car Excel commence à 1 et il y a l'en-tête
-                        cell = worksheet.cell(row=row_idx, column=match_col_idx)
-                        if cell.value == "Oui":
-                            # Vert clair
-                            cell.fill = openpyxl.styles.PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                        elif cell.value == "Non":
-                            # Rouge clair pour la cellule de correspondance
-                            cell.fill = openpyxl.styles.PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                            
-                            # Surligner toute la ligne en rouge clair si pas de correspondance d'adresse
-                            light_red = openpyxl.styles.PatternFill(start_color="FFEBEE", end_color="FFEBEE", fill_type="solid")
-                            for col_idx in range(1, len(df.columns) + 1):
-                                if col_idx != match_col_idx:  # Ne pas changer la couleur de la cellule Match_Adresse
-                                    worksheet.cell(row=row_idx, column=col_idx).fill = light_red
+                if xlsxwriter is not None:
+                    write_excel_xlsxwriter(df, tmp_output_file, match_col_idx, pl_df)
                 else:
-                    logging.warning("Module openpyxl non disponible, formatage conditionnel désactivé")
-        except Exception as e:
-            logging.warning(f"Erreur lors de l'application du formatage conditionnel: {str(e)}")
-            # Sauvegarde simple sans formatage
-            df.to_excel(output_file, index=False)
+                    write_excel_openpyxl(df, tmp_output_file, match_col_idx, pl_df)
+                os.replace(tmp_output_file, output_file)
+            except Exception as e:
+                logging.warning(f"Erreur lors de l'application du formatage conditionnel: {str(e)}")
+                if os.path.exists(tmp_output_file):
+                    os.remove(tmp_output_file)
+                # Sauvegarde simple sans formatage, une seule fois et directement dans le fichier de sortie
+                df.to_excel(output_file, index=False)
         
-        # Sauvegarder aussi en CSV
-        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+        # Attendre la fin de l'écriture du CSV
+        if csv_future is not None:
+            csv_future.result()
         logging.info(f"Résultats sauvegardés dans {output_file} et {csv_output_file}")
         
         return True
@@ -644,21 +972,28 @@ def main():
                       help="Chemin vers le fichier Excel d'entrée")
     parser.add_argument('--output', '-o', type=str, default="data_enrichi.xlsx",
                       help="Chemin vers le fichier Excel de sortie")
-    parser.add_argument('--token', '-t', type=str, 
-                      help="Token d'API Recherche d'Entreprises")
+    parser.add_argument('--token', '-t', type=str, default=os.environ.get('RECHERCHE_ENTREPRISES_TOKEN'),
+                      help="Token d'API Recherche d'Entreprises (par défaut: variable d'environnement RECHERCHE_ENTREPRISES_TOKEN)")
     parser.add_argument('--debug', '-d', action='store_true',
                       help="Active le mode debug")
+    parser.add_argument('--no-cache', action='store_true',
+                      help="Désactive le cache des réponses de l'API")
+    parser.add_argument('--refresh-cache', action='store_true',
+                      help="Ignore les réponses en cache mais enregistre les nouvelles réponses de l'API")
+    parser.add_argument('--workers', '-w', type=int, default=MAX_WORKERS,
+                      help=f"Nombre de requêtes simultanées vers l'API (par défaut: {MAX_WORKERS})")
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers doit être supérieur ou égal à 1")
+    if not args.token or not args.token.strip():
+        parser.error("token d'API manquant: utilisez --token ou définissez RECHERCHE_ENTREPRISES_TOKEN")
     
     # Configurer le niveau de log
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
         logging.info("Mode debug activé")
     
-    # Définir le token (utilisez celui fourni en argument ou celui par défaut)
-    token = args.token if args.token else "14e3d8bb-190f-4fcc-a3d8-bb190fffcc2c"
-    
     # Définir les chemins de fichiers
     input_path = os.path.abspath(args.input)
     output_path = os.path.abspath(args.output)
@@ -667,11 +1002,12 @@ def main():
     logging.info(f"Le résultat sera sauvegardé dans: {output_path}")
     
     # Vérifier que les dépendances sont installées
-    if 'openpyxl' not in sys.modules:
-        logging.warning("Module openpyxl non trouvé. Le formatage conditionnel ne sera pas appliqué.")
+    if not HAS_OPENPYXL and xlsxwriter is None:
+        logging.warning("Modules openpyxl et xlsxwriter non trouvés. Le formatage conditionnel ne sera pas appliqué.")
         
     # Exécuter l'enrichissement
-    success = enrich_excel_file(input_path, output_path, token)
+    success = enrich_excel_file(input_path, output_path, args.token, use_cache=not args.no_cache,
+                                workers=args.workers, refresh_cache=args.refresh_cache)
     
     if success:
         logging.info("Traitement terminé avec succès")
@@ -6,9 +6,17 @@ if [ "$1" = "--help" ] || [ "$1" = "-h" ]; then
   echo "Usage: ./run.sh [input_file] [output_file]"
   echo "  input_file  : Chemin vers le fichier Excel d'entrée (par défaut: data.xlsx)"
   echo "  output_file : Chemin vers le fichier Excel de sortie (par défaut: data_enrichi.xlsx)"
+  echo ""
+  echo "Le token d'API est lu dans la variable d'environnement RECHERCHE_ENTREPRISES_TOKEN :"
+  echo "  RECHERCHE_ENTREPRISES_TOKEN=votre_token ./run.sh [input_file] [output_file]"
   exit 0
 fi
 
+if [ -z "$RECHERCHE_ENTREPRISES_TOKEN" ]; then
+  echo "Erreur : définissez la variable d'environnement RECHERCHE_ENTREPRISES_TOKEN (voir ./run.sh --help)"
+  exit 1
+fi
+
 INPUT_FILE="${1:-data.xlsx}"
 OUTPUT_FILE="${2:-data_enrichi.xlsx}"
 